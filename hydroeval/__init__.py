@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with HydroEval. If not, see <http://www.gnu.org/licenses/>.
 
-from .hydroeval import evaluator
+from .hydroeval import evaluator, evaluator_batch, PreparedEvaluation
 
 from .objective_functions import nse, nse_c2m, kge, kge_c2m, kgeprime, kgeprime_c2m, kgenp, kgenp_c2m, rmse, mare, pbias
 from .version import __version__
@@ -0,0 +1,262 @@
+# This file is part of HydroEval: an evaluator for streamflow time series
+# Copyright (C) 2020  Thibault Hallouin
+#
+# HydroEval is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# HydroEval is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with HydroEval. If not, see <http://www.gnu.org/licenses/>.
+
+import math
+import numpy as np
+
+from . import objective_functions as _of
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+try:
+    # kernels compiled ahead of time with hydroeval._kernels_aot
+    from . import hydroeval_kernels
+except ImportError:
+    hydroeval_kernels = None
+
+
+# integer codes for the transformations, to be passed to the kernels
+# (the logarithm is applied by numpy beforehand, see `_sums`)
+TRANSFORMS = {None: 0, 'inv': 1, 'sqrt': 2}
+
+# floating point types supported by the kernels
+DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+# objective functions for which a fused kernel is available
+# (left empty if numba is not installed)
+fused = {}
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# COMPILED KERNELS
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _apply(x, transform, epsilon):
+    """Apply the transformation identified by its integer code to
+    one streamflow value."""
+    if transform == 1:
+        return 1.0 / (x + epsilon)
+    elif transform == 2:
+        return math.sqrt(x)
+    return x
+
+
+def _moments(simulations, evaluation, transform, epsilon, default_epsilon):
+    """Compute in one go all the sums required by the objective
+    functions on the (transformed) 1D *simulations* and *evaluation*
+    series, skipping the time steps where *evaluation* is NaN.
+
+    If *default_epsilon* is true, *epsilon* is ignored and set to one
+    hundredth of the mean of the available *evaluation* values.
+
+    Note, the sums returned are, in this order: the number of time
+    steps used, the sums of *s* and *e*, the sums of squared deviations
+    of *s* and *e* from their means, the sum of cross deviations, and
+    the sums of squared, absolute, and raw errors *e* - *s*.
+
+    """
+    n = evaluation.shape[0]
+
+    # determine the default epsilon on the raw evaluation series
+    if transform == 1 and default_epsilon:
+        raw = 0.0
+        count = 0
+        for i in prange(n):
+            if not math.isnan(evaluation[i]):
+                raw += evaluation[i]
+                count += 1
+        epsilon = 0.01 * raw / count
+
+    # first pass: sums of the transformed series
+    count = 0
+    sum_s = 0.0
+    sum_e = 0.0
+    for i in prange(n):
+        if not math.isnan(evaluation[i]):
+            count += 1
+            sum_s += _apply(simulations[i], transform, epsilon)
+            sum_e += _apply(evaluation[i], transform, epsilon)
+    mean_s = sum_s / count
+    mean_e = sum_e / count
+
+    # second pass: sums of deviations and errors
+    dev_ss = 0.0
+    dev_ee = 0.0
+    dev_se = 0.0
+    err_sq = 0.0
+    err_abs = 0.0
+    err = 0.0
+    for i in prange(n):
+        if not math.isnan(evaluation[i]):
+            s = _apply(simulations[i], transform, epsilon)
+            e = _apply(evaluation[i], transform, epsilon)
+            dev_ss += (s - mean_s) ** 2
+            dev_ee += (e - mean_e) ** 2
+            dev_se += (s - mean_s) * (e - mean_e)
+            err_sq += (e - s) ** 2
+            err_abs += abs(e - s)
+            err += e - s
+
+    return (count, sum_s, sum_e, dev_ss, dev_ee, dev_se,
+            err_sq, err_abs, err)
+
+
+if njit is not None:
+    # 'nnan' and 'ninf' are deliberately left out of the fast-math
+    # flags, otherwise the NaN checks could be optimised away
+    _apply = njit(inline='always', error_model='numpy')(_apply)
+    _moments = njit(parallel=True, cache=True, error_model='numpy',
+                    fastmath={'nsz', 'arcp', 'contract', 'reassoc'})(_moments)
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# FUSED OBJECTIVE FUNCTIONS
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _sums(simulations, evaluation, transform, epsilon):
+    if transform == 'log':
+        # the logarithm is left to numpy, whose vectorised implementation
+        # is several times faster than the scalar one available in the
+        # kernel, so that only the reductions are fused in this case
+        if epsilon is None:
+            # (following recommendation in Pushpalatha et al. (2012))
+            total = evaluation.sum()
+            epsilon = 0.01 * (total / evaluation.size if total == total
+                              else np.nanmean(evaluation))
+        raw = evaluation
+        simulations = np.add(simulations, epsilon, dtype=simulations.dtype)
+        evaluation = np.add(evaluation, epsilon, dtype=evaluation.dtype)
+        np.log(simulations, out=simulations)
+        np.log(evaluation, out=evaluation)
+        with np.errstate(invalid='ignore'):
+            total = evaluation.sum()
+        if total != total:
+            # NaN introduced by the logarithm itself (i.e. where evaluation
+            # plus epsilon is negative) must propagate to the objective
+            # function rather than be mistaken for missing observations
+            # by the kernel, so they are moved to the simulations instead
+            lost = np.isnan(evaluation) & ~np.isnan(raw)
+            evaluation[lost] = 0.0
+            simulations[lost] = np.nan
+        transform = None
+
+    transform = TRANSFORMS[transform]
+    default_epsilon = epsilon is None
+    epsilon = 0.0 if default_epsilon else float(epsilon)
+
+    if hydroeval_kernels is not None:
+        # (the ahead-of-time kernel is only compiled for float64)
+        sums = hydroeval_kernels.moments_1d(
+            simulations.astype(np.float64, copy=False),
+            evaluation.astype(np.float64, copy=False),
+            transform, epsilon, default_epsilon
+        )
+    else:
+        sums = _moments(simulations, evaluation, transform, epsilon,
+                        default_epsilon)
+
+    # numpy scalars are used so that degenerate series behave
+    # as in the objective functions (i.e. warn rather than raise)
+    return np.array(sums, dtype=np.float64)
+
+
+def _nse(simulations, evaluation, transform, epsilon):
+    _, _, _, _, dev_ee, _, err_sq, _, _ = _sums(
+        simulations, evaluation, transform, epsilon)
+
+    return np.array([1 - err_sq / dev_ee])
+
+
+def _nse_c2m(simulations, evaluation, transform, epsilon):
+    nse_ = _nse(simulations, evaluation, transform, epsilon)
+
+    return nse_ / (2 - nse_)
+
+
+def _kge(simulations, evaluation, transform, epsilon):
+    _, sum_s, sum_e, dev_ss, dev_ee, dev_se, _, _, _ = _sums(
+        simulations, evaluation, transform, epsilon)
+
+    r = dev_se / np.sqrt(dev_ss * dev_ee)
+    alpha = np.sqrt(dev_ss) / np.sqrt(dev_ee)
+    beta = sum_s / sum_e
+    kge_ = 1 - np.sqrt((r - 1) ** 2 + (alpha - 1) ** 2 + (beta - 1) ** 2)
+
+    return np.array([[kge_], [r], [alpha], [beta]])
+
+
+def _kge_c2m(simulations, evaluation, transform, epsilon):
+    kge_ = _kge(simulations, evaluation, transform, epsilon)[0, :]
+
+    return kge_ / (2 - kge_)
+
+
+def _kgeprime(simulations, evaluation, transform, epsilon):
+    n, sum_s, sum_e, dev_ss, dev_ee, dev_se, _, _, _ = _sums(
+        simulations, evaluation, transform, epsilon)
+
+    r = dev_se / np.sqrt(dev_ss * dev_ee)
+    gamma = ((np.sqrt(dev_ss / n) / (sum_s / n))
+             / (np.sqrt(dev_ee / n) / (sum_e / n)))
+    beta = sum_s / sum_e
+    kgeprime_ = 1 - np.sqrt((r - 1) ** 2 + (gamma - 1) ** 2 + (beta - 1) ** 2)
+
+    return np.array([[kgeprime_], [r], [gamma], [beta]])
+
+
+def _kgeprime_c2m(simulations, evaluation, transform, epsilon):
+    kgeprime_ = _kgeprime(simulations, evaluation, transform, epsilon)[0, :]
+
+    return kgeprime_ / (2 - kgeprime_)
+
+
+def _rmse(simulations, evaluation, transform, epsilon):
+    n, _, _, _, _, _, err_sq, _, _ = _sums(
+        simulations, evaluation, transform, epsilon)
+
+    return np.array([np.sqrt(err_sq / n)])
+
+
+def _mare(simulations, evaluation, transform, epsilon):
+    _, _, sum_e, _, _, _, _, err_abs, _ = _sums(
+        simulations, evaluation, transform, epsilon)
+
+    return np.array([err_abs / sum_e])
+
+
+def _pbias(simulations, evaluation, transform, epsilon):
+    _, _, sum_e, _, _, _, _, _, err = _sums(
+        simulations, evaluation, transform, epsilon)
+
+    return np.array([100 * err / sum_e])
+
+
+if njit is not None or hydroeval_kernels is not None:
+    fused.update({
+        _of.nse: _nse,
+        _of.nse_c2m: _nse_c2m,
+        _of.kge: _kge,
+        _of.kge_c2m: _kge_c2m,
+        _of.kgeprime: _kgeprime,
+        _of.kgeprime_c2m: _kgeprime_c2m,
+        _of.rmse: _rmse,
+        _of.mare: _mare,
+        _of.pbias: _pbias
+    })
@@ -0,0 +1,56 @@
+# This file is part of HydroEval: an evaluator for streamflow time series
+# Copyright (C) 2020  Thibault Hallouin
+#
+# HydroEval is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# HydroEval is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with HydroEval. If not, see <http://www.gnu.org/licenses/>.
+
+"""Ahead-of-time compilation of the fused kernels into the extension
+module `hydroeval.hydroeval_kernels`, so that `evaluator` does not pay
+for the just-in-time compilation in every new process.
+
+Run once, with numba installed, from the package installation::
+
+    python -m hydroeval._kernels_aot
+
+"""
+import os
+
+from numba import njit
+from numba.pycc import CC
+
+from hydroeval import _kernels
+
+
+cc = CC('hydroeval_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# AOT compilation does not support parallel loops nor the choice of
+# the error model, so the serial kernel is compiled as a separate
+# function with the numpy error model (i.e. division by zero yields
+# inf rather than raising) and called from the exported function
+_moments = njit(error_model='numpy',
+                fastmath={'nsz', 'arcp', 'contract', 'reassoc'})(
+    _kernels._moments.py_func
+)
+
+
+@cc.export('moments_1d',
+           'Tuple((i8, f8, f8, f8, f8, f8, f8, f8, f8))'
+           '(f8[:], f8[:], i8, f8, b1)')
+def moments_1d(simulations, evaluation, transform, epsilon, default_epsilon):
+    return _moments(simulations, evaluation, transform, epsilon,
+                    default_epsilon)
+
+
+if __name__ == '__main__':
+    cc.compile()
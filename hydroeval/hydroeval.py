@@ -17,9 +17,11 @@
 import numpy as np
 import numbers
 
+from . import _kernels
+
 
 def evaluator(obj_fn, simulations, evaluation, axis=0,
-              transform=None, epsilon=None):
+              transform=None, epsilon=None, dtype=None):
     """Evaluate the goodness of fit between one time series of simulated
     streamflow stored in a 1D array (or several time series of equal
     length stored in a 2D array) and one time series of the corresponding
@@ -57,11 +59,18 @@ def evaluator(obj_fn, simulations, evaluation, axis=0,
             be set as `numpy.nan` so that pairwise deletion in both
             *simulations* and *evaluation* series can be performed prior
             the calculation of the *obj_fn*.
+            Alternatively, a `PreparedEvaluation` can be given, in
+            which case *transform*, *epsilon*, and *dtype* must be
+            given to `PreparedEvaluation` rather than to `evaluator`.
 
         axis: `int`, optional
             The axis along which the *simulations* and/or *evaluation*
             time dimension is, if any is a 2D array. If not provided,
-            set to default value 0.
+            set to default value 0. Note, for 2D *simulations*, the
+            time series are processed in Fortran order, so providing
+            them stacked along time in a C-ordered array with *axis*
+            set to 1 (or along *axis* 0 in a Fortran-ordered array)
+            avoids a copy.
 
         transform: `str`, optional
             The transformation to apply to both the *simulations* and
@@ -92,6 +101,14 @@ def evaluator(obj_fn, simulations, evaluation, axis=0,
             recommended by `Pushpalatha et al. (2012)
             <https://doi.org/10.1016/j.jhydrol.2011.11.055>`_.
 
+        dtype: `str` or `numpy.dtype`, optional
+            The floating point type in which the *simulations* and
+            *evaluation* streamflow values are pre-processed and given
+            to the *obj_fn* (e.g. ``'float32'`` to halve the memory
+            traffic when evaluating large ensembles, at the cost of
+            precision). If not provided, the type of the arrays given
+            is kept.
+
     **Examples**
 
     >>> import hydroeval as he
@@ -148,80 +165,340 @@ def evaluator(obj_fn, simulations, evaluation, axis=0,
      [ 2.42185928]
      [ 2.23383214]]
 
+    Computations can be performed in single precision with parameter *dtype*.
+
+    >>> print(he.evaluator(he.rmse, [5.3, 4.2, 5.7, 2.3], [4.7, 4.3, 5.5, 2.7],
+    ...                    dtype='float32'))
+    [0.3774919]
+
     """
     # check types/values of the different arguments given,
     # if not compliant, abort
-    simulations = np.asarray(simulations)
-    if not simulations.shape:
-        raise TypeError('simulations must be an array')
-    if not np.issubdtype(simulations.dtype, np.number):
-        raise TypeError('simulations array must contain numerical values')
-    evaluation = np.asarray(evaluation)
-    if not evaluation.shape:
-        raise TypeError('evaluation must be an array')
-    if not np.issubdtype(evaluation.dtype, np.number):
-        raise TypeError('evaluation array must contain numerical values')
+    simulations = _check_array(simulations, 'simulations')
+    if isinstance(evaluation, PreparedEvaluation):
+        if (transform is not None or epsilon is not None
+                or dtype is not None):
+            raise ValueError('transform, epsilon, and dtype must be given '
+                             'to PreparedEvaluation, not to evaluator')
+        prepared = evaluation
+    else:
+        prepared = None
+        evaluation = _check_array(evaluation, 'evaluation')
+    dtype = _check_options(axis, transform, epsilon, dtype)
+
+    my_simu = _simulation_series(simulations, axis)
+
+    if prepared is None:
+        my_eval = _evaluation_series(evaluation, axis)
+
+        # check that the two arrays have compatible lengths
+        if not my_simu.shape[0] == my_eval.shape[0]:
+            raise ValueError('simulation and evaluation arrays feature '
+                             'incompatible dimensions')
+
+        # use a fused kernel (pairwise deletion, transformation, and
+        # objective function in a single compiled loop) for a single
+        # simulation series if one is available for this objective function
+        if my_simu.shape[1] == 1 and obj_fn in _kernels.fused:
+            my_simu_ = _as_dtype(my_simu[:, 0], dtype)
+            my_eval_ = _as_dtype(my_eval, dtype)
+            # (numba only supports single and double precision floats,
+            # any other type falls through to the numpy implementation)
+            if (my_simu_.dtype in _kernels.DTYPES
+                    and my_eval_.dtype in _kernels.DTYPES):
+                result = _kernels.fused[obj_fn](my_simu_, my_eval_,
+                                                transform, epsilon)
+                return (result if axis == 0
+                        else np.ascontiguousarray(result.T))
+
+        # when no transformation is required and the evaluation series
+        # is complete, the objective function is called directly on views
+        # of the input arrays without any intermediate copy
+        if transform is None and not _has_nan(my_eval):
+            result = obj_fn(_as_dtype(my_simu, dtype),
+                            _as_dtype(my_eval, dtype)[:, None])
+            return result if axis == 0 else np.ascontiguousarray(result.T)
+
+        prepared = PreparedEvaluation._from_series(my_eval, transform,
+                                                   epsilon, dtype)
+
+    # check that the two arrays have compatible lengths
+    if not my_simu.shape[0] == prepared.size:
+        raise ValueError('simulation and evaluation arrays feature '
+                         'incompatible dimensions')
+
+    # generate a subset of simulation series where evaluation data is
+    # available, and store each simulation series contiguously in memory
+    # (i.e. in Fortran order) for the reductions along time in the obj_fn,
+    # converting them to the requested type if any (gathering along the
+    # last axis of the transpose yields a Fortran-ordered subset in a
+    # single copy whatever the input order, so the conversion below
+    # only copies again if the type needs changing)
+    if prepared.avail is not None:
+        my_simu = np.take(my_simu.T, prepared.avail, axis=1).T
+    my_simu = my_simu.astype(
+        my_simu.dtype if prepared.dtype is None else prepared.dtype,
+        order='F', copy=False
+    )
+
+    # transform the flow series if required
+    my_simu = _transform(my_simu, prepared.transform, prepared.epsilon)
+
+    # calculate the requested function and return in the same array
+    # orientation (the evaluation series is given as a column view to
+    # be broadcast against the simulation series)
+    my_eval = prepared.series[:, None]
+    if axis == 0:
+        return obj_fn(my_simu, my_eval)
+    else:
+        return np.ascontiguousarray(obj_fn(my_simu, my_eval).T)
+
+
+def evaluator_batch(obj_fn, simulations, evaluation,
+                    transform=None, epsilon=None, dtype=None):
+    """Evaluate the goodness of fit between a batch of time series of
+    simulated streamflow (e.g. from a Monte Carlo or a GLUE experiment)
+    and one time series of the corresponding observed streamflow, in
+    one vectorised call to the objective function.
+
+    :Parameters:
+
+        obj_fn: `hydroeval` objective function
+            The objective function to use to evaluate the goodness of
+            fit between the *simulations* series and the *evaluation*
+            series.
+
+        simulations: array-like object
+            The array of simulated streamflow values, whose last
+            dimension must be the time dimension, and whose leading
+            dimensions (any number of them) index the simulations in
+            the batch (e.g. one row per parameter set).
+
+        evaluation: array-like object or `PreparedEvaluation`
+            The array of observed streamflow values. See `evaluator`
+            for details.
+
+        transform: `str`, optional
+            The transformation to apply to the streamflow values. See
+            `evaluator` for details.
+
+        epsilon: `float`, optional
+            The value of the small constant ε to add to the streamflow
+            values. See `evaluator` for details.
+
+        dtype: `str` or `numpy.dtype`, optional
+            The floating point type in which the streamflow values are
+            processed. See `evaluator` for details.
+
+    :Returns:
+
+        `numpy.ndarray`
+            The values of the objective function, whose leading
+            dimensions are the ones of *simulations*, with an additional
+            last dimension for the objective functions returning
+            several values (e.g. `kge`).
+
+    **Examples**
+
+    >>> import hydroeval as he
+    >>> print(he.evaluator_batch(he.nse, [[5.3, 4.2, 5.7, 2.3],
+    ...                                   [4.6, 4.2, 5.3, 2.8]],
+    ...                          [4.7, 4.3, 5.5, 2.7]))
+    [0.86298077 0.98317308]
+    >>> print(he.evaluator_batch(he.kge, [[[5.3, 4.2, 5.7, 2.3]],
+    ...                                   [[4.6, 4.2, 5.3, 2.8]]],
+    ...                          [4.7, 4.3, 5.5, 2.7]).shape)
+    (2, 1, 4)
+
+    """
+    simulations = _check_array(simulations, 'simulations')
+    batch = simulations.shape[:-1]
+
+    # view the batch as a (time, simulations) array, which for
+    # a C-ordered input holds each series contiguously in memory
+    my_simu = simulations.reshape(-1, simulations.shape[-1]).T
+
+    result = evaluator(obj_fn, my_simu, evaluation,
+                       transform=transform, epsilon=epsilon, dtype=dtype)
+
+    return np.moveaxis(result, -1, 0).reshape(batch + result.shape[:-1])
+
+
+class PreparedEvaluation(object):
+    """Pre-process one time series of observed streamflow once so that
+    it can be evaluated against many simulations with `evaluator`
+    (e.g. in a calibration loop) without repeating the pairwise
+    deletion and the transformation on the *evaluation* series.
+
+    :Parameters:
+
+        evaluation: array-like object
+            The array of observed streamflow values. See `evaluator`
+            for details.
+
+        axis: `int`, optional
+            The axis along which the *evaluation* time dimension is,
+            if it is a 2D array. If not provided, set to default
+            value 0.
+
+        transform: `str`, optional
+            The transformation to apply to the *evaluation* series and
+            to all the *simulations* series it will be evaluated
+            against. See `evaluator` for the supported transformations.
+
+        epsilon: `float`, optional
+            The value of the small constant ε to add to the streamflow
+            values prior the reciprocal or logarithm transformations.
+            See `evaluator` for details on its default value.
+
+        dtype: `str` or `numpy.dtype`, optional
+            The floating point type in which the *evaluation* series
+            and all the *simulations* series it will be evaluated
+            against are processed. See `evaluator` for details.
+
+    **Examples**
+
+    >>> import hydroeval as he
+    >>> obs = he.PreparedEvaluation([4.7, 4.3, 5.5, 2.7], transform='sqrt')
+    >>> print(he.evaluator(he.nse, [5.3, 4.2, 5.7, 2.3], obs))
+    [0.86356266]
+    >>> print(he.evaluator(he.nse, [4.6, 4.2, 5.3, 2.8], obs))
+    [0.98543654]
+
+    """
+    def __init__(self, evaluation, axis=0, transform=None, epsilon=None,
+                 dtype=None):
+        evaluation = _check_array(evaluation, 'evaluation')
+        dtype = _check_options(axis, transform, epsilon, dtype)
+        self._prepare(_evaluation_series(evaluation, axis),
+                      transform, epsilon, dtype)
+
+    @classmethod
+    def _from_series(cls, my_eval, transform, epsilon, dtype):
+        # bypass the checks already performed by evaluator
+        prepared = cls.__new__(cls)
+        prepared._prepare(my_eval, transform, epsilon, dtype)
+
+        return prepared
+
+    def _prepare(self, my_eval, transform, epsilon, dtype):
+        self.size = my_eval.shape[0]
+
+        # determine where evaluation data is available (complete series
+        # are used as is, otherwise the indices of the available data
+        # are determined once to gather the simulation series)
+        if _has_nan(my_eval):
+            self.avail = np.flatnonzero(~np.isnan(my_eval))
+            my_eval = my_eval[self.avail]
+        else:
+            self.avail = None
+        my_eval = _as_dtype(my_eval, dtype)
+
+        if transform in ('log', 'inv') and epsilon is None:
+            # determine an epsilon value to avoid log of zero or zero divide
+            # (following recommendation in Pushpalatha et al. (2012))
+            epsilon = 0.01 * np.mean(my_eval)
+
+        self.transform = transform
+        self.epsilon = epsilon
+        self.dtype = dtype
+        self.series = _transform(my_eval, transform, epsilon)
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# HELPER FUNCTIONS
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _check_array(array, name):
+    # (these checks run on every call, so the exact type and the dtype
+    # kind are tested rather than going through np.asarray for arrays
+    # and through np.issubdtype, which are noticeably slower)
+    if type(array) is not np.ndarray:
+        array = np.asarray(array)
+    if not array.shape:
+        raise TypeError('{} must be an array'.format(name))
+    if array.dtype.kind not in 'iufc':
+        raise TypeError('{} array must contain numerical values'.format(name))
+
+    return array
+
+
+def _check_options(axis, transform, epsilon, dtype):
     if axis not in (0, 1):
         raise IndexError('index for axis must be 0 or 1')
     if transform is not None:
         if transform not in ('inv', 'sqrt', 'log'):
             raise ValueError('transform parameter not supported')
     if epsilon is not None:
-        if not isinstance(epsilon, numbers.Number):
+        if (type(epsilon) not in (float, int)
+                and not isinstance(epsilon, numbers.Number)):
             raise TypeError('epsilon must be a number')
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        if not dtype.kind == 'f':
+            raise TypeError('dtype must be a floating point type')
 
-    # check that the evaluation data provided is a single series of data
-    if evaluation.ndim == 1:
-        my_eval = np.reshape(evaluation, (evaluation.size, 1))
-    elif evaluation.ndim == 2:
-        if axis == 0:
-            my_eval = evaluation
-        else:  # axis == 1
-            my_eval = evaluation.T
-    else:
-        raise ValueError('evaluation array contains more than 2 dimensions')
-    if not my_eval.shape[1] == 1:
-        raise ValueError('evaluation array is not flat')
+    return dtype
 
-    # check the dimensions of the simulation data provided
+
+def _as_dtype(flows, dtype):
+    # (no copy is made if the flows are already of the requested type)
+    return flows if dtype is None else flows.astype(dtype, copy=False)
+
+
+def _has_nan(series):
+    # the sum is NaN if the series contains any NaN, which is cheaper
+    # than building a mask when the series is complete
+    with np.errstate(invalid='ignore', over='ignore'):
+        # (infinite values of opposite signs also yield a NaN sum,
+        # in which case the mask built afterwards simply keeps everything)
+        total = series.sum()
+
+    return total != total
+
+
+def _simulation_series(simulations, axis):
+    # check the dimensions of the simulation data provided and view them
+    # as a (time, simulations) array, a 1D array being a single series
+    # (no copy is made when transposing because the transpose of a
+    # C-ordered array already holds each series contiguously)
+    if simulations.ndim > 2:
+        raise ValueError('simulation array contains more than 2 dimensions')
     if simulations.ndim == 1:
-        my_simu = np.reshape(simulations, (simulations.size, 1))
-    elif simulations.ndim == 2:
+        return simulations[:, None]
+
+    return simulations.T if axis == 1 else simulations
+
+
+def _evaluation_series(evaluation, axis):
+    # check that the evaluation data provided is a single series of data
+    # (kept as a 1D array, the objective functions being given a column
+    # view of it only when they are called)
+    if evaluation.ndim > 2:
+        raise ValueError('evaluation array contains more than 2 dimensions')
+    my_eval = evaluation
+    if evaluation.ndim == 2:
         if axis == 0:
-            my_simu = simulations
-        else:  # axis == 1
-            my_simu = simulations.T
-    else:
-        raise ValueError('simulation array contains more than 2 dimensions')
+            my_eval = my_eval.T
+        if not my_eval.shape[0] == 1:
+            raise ValueError('evaluation array is not flat')
+        my_eval = my_eval[0]
 
-    # check that the two arrays have compatible lengths
-    if not my_simu.shape[0] == my_eval.shape[0]:
-        raise ValueError('simulation and evaluation arrays feature '
-                         'incompatible dimensions')
+    # make sure the series is stored contiguously (which is a no-op in
+    # the common case, including for a flat column or row)
+    return np.ascontiguousarray(my_eval)
 
-    # generate a subset of simulation and evaluation series
-    # where evaluation data is available
-    my_simu = my_simu[~np.isnan(my_eval[:, 0]), :]
-    my_eval = my_eval[~np.isnan(my_eval[:, 0]), :]
 
-    # transform the flow series if required
+def _transform(flows, transform, epsilon):
+    # (epsilon is added into a new floating point array which is then
+    # transformed in place to avoid allocating a second temporary array)
     if transform == 'log':  # log transformation
-        if not epsilon:
-            # determine an epsilon value to avoid log of zero
-            # (following recommendation in Pushpalatha et al. (2012))
-            epsilon = 0.01 * np.mean(my_eval)
-        my_eval, my_simu = np.log(my_eval + epsilon), np.log(my_simu + epsilon)
+        flows = np.add(flows, epsilon, dtype=np.result_type(flows, 1.0))
+        np.log(flows, out=flows)
     elif transform == 'inv':  # inverse transformation
-        if not epsilon:
-            # determine an epsilon value to avoid zero divide
-            # (following recommendation in Pushpalatha et al. (2012))
-            epsilon = 0.01 * np.mean(my_eval)
-        my_eval, my_simu = 1.0 / (my_eval + epsilon), 1.0 / (my_simu + epsilon)
+        flows = np.add(flows, epsilon, dtype=np.result_type(flows, 1.0))
+        np.reciprocal(flows, out=flows)
     elif transform == 'sqrt':  # square root transformation
-        my_eval, my_simu = np.sqrt(my_eval), np.sqrt(my_simu)
+        flows = np.sqrt(flows)
 
-    # calculate the requested function and return in the same array orientation
-    if axis == 0:
-        return obj_fn(my_simu, my_eval)
-    else:
-        return obj_fn(my_simu, my_eval).T
+    return flows
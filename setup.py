@@ -56,4 +56,8 @@ setup(
     install_requires=[
         'numpy'
     ],
+
+    extras_require={
+        'numba': ['numba']
+    },
 )
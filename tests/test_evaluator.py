@@ -1,13 +1,185 @@
 import unittest
 import doctest
+import numpy
 
 import hydroeval
 
 
+class TestEvaluator(unittest.TestCase):
+
+    rng = numpy.random.default_rng(7)
+    sim = rng.uniform(0.1, 20., (60, 3))
+    obs = rng.uniform(0.1, 20., 60)
+
+    def test_other_float_types(self):
+        for dtype in (numpy.float16, numpy.longdouble):
+            with self.subTest(dtype=dtype.__name__):
+                numpy.testing.assert_almost_equal(
+                    hydroeval.evaluator(hydroeval.nse,
+                                        self.sim[:, 0].astype(dtype),
+                                        self.obs.astype(dtype)),
+                    hydroeval.nse(self.sim[:, [0]].astype(dtype),
+                                  self.obs[:, None].astype(dtype)),
+                    decimal=3
+                )
+
+    def test_zero_epsilon(self):
+        for transform, fn in (('log', numpy.log), ('inv', numpy.reciprocal)):
+            with self.subTest(transform=transform):
+                expected = hydroeval.nse(fn(self.sim), fn(self.obs)[:, None])
+                numpy.testing.assert_almost_equal(
+                    hydroeval.evaluator(hydroeval.nse, self.sim, self.obs,
+                                        transform=transform, epsilon=0.0),
+                    expected
+                )
+                prepared = hydroeval.PreparedEvaluation(
+                    self.obs, transform=transform, epsilon=0.0)
+                self.assertEqual(prepared.epsilon, 0.0)
+                numpy.testing.assert_almost_equal(
+                    hydroeval.evaluator(hydroeval.nse, self.sim, prepared),
+                    expected
+                )
+
+    def test_single_precision(self):
+        obs = self.obs.copy()
+        obs[[3, 30]] = numpy.nan
+        avail = ~numpy.isnan(obs)
+        received = []
+
+        def nse(simulations, evaluation):
+            received.append((simulations, evaluation))
+            return hydroeval.nse(simulations, evaluation)
+
+        numpy.testing.assert_almost_equal(
+            hydroeval.evaluator(nse, self.sim, obs, transform='sqrt',
+                                dtype='float32'),
+            hydroeval.nse(
+                numpy.sqrt(self.sim[avail].astype(numpy.float32)),
+                numpy.sqrt(obs[avail, None].astype(numpy.float32))
+            )
+        )
+        simulations, evaluation = received[0]
+        self.assertEqual(simulations.dtype, numpy.float32)
+        self.assertEqual(evaluation.dtype, numpy.float32)
+        self.assertTrue(simulations.flags.f_contiguous)
+
+    def test_half_precision(self):
+        numpy.testing.assert_almost_equal(
+            hydroeval.evaluator(hydroeval.nse, self.sim[:, 0], self.obs,
+                                dtype='float16'),
+            hydroeval.nse(self.sim[:, [0]].astype(numpy.float16),
+                          self.obs[:, None].astype(numpy.float16)),
+        )
+
+    def test_pairwise_deletion_2d(self):
+        obs = self.obs.copy()
+        obs[[0, 9, 10, 59]] = numpy.nan
+        avail = ~numpy.isnan(obs)
+        epsilon = 0.01 * numpy.mean(obs[avail])
+        for transform, fn in ((None, lambda q: q), ('sqrt', numpy.sqrt),
+                              ('log', lambda q: numpy.log(q + epsilon))):
+            expected = hydroeval.kge(fn(self.sim[avail]),
+                                     fn(obs[avail, None]))
+            for order in ('C', 'F'):
+                for axis in (0, 1):
+                    with self.subTest(transform=transform, order=order,
+                                      axis=axis):
+                        received = []
+
+                        def kge(simulations, evaluation):
+                            received.append(simulations)
+                            return hydroeval.kge(simulations, evaluation)
+
+                        sim = numpy.asarray(
+                            self.sim if axis == 0 else self.sim.T,
+                            order=order
+                        )
+                        result = hydroeval.evaluator(
+                            kge, sim, obs, axis=axis, transform=transform)
+                        numpy.testing.assert_almost_equal(
+                            result if axis == 0 else result.T, expected)
+                        self.assertTrue(received[0].flags.f_contiguous)
+
+
+class TestPreparedEvaluation(unittest.TestCase):
+
+    rng = numpy.random.default_rng(11)
+    sim = rng.uniform(0.1, 20., (60, 3))
+    obs = rng.uniform(0.1, 20., 60)
+    obs[[4, 21, 22, 50]] = numpy.nan
+
+    def test_against_evaluator(self):
+        for obj_fn in (hydroeval.nse, hydroeval.kge, hydroeval.rmse):
+            for transform in (None, 'log', 'inv', 'sqrt'):
+                with self.subTest(objective_function=obj_fn.__name__,
+                                  transform=transform):
+                    prepared = hydroeval.PreparedEvaluation(
+                        self.obs, transform=transform)
+                    numpy.testing.assert_array_equal(
+                        prepared.avail, [i for i in range(60)
+                                         if i not in (4, 21, 22, 50)]
+                    )
+                    numpy.testing.assert_almost_equal(
+                        hydroeval.evaluator(obj_fn, self.sim, prepared),
+                        hydroeval.evaluator(obj_fn, self.sim, self.obs,
+                                            transform=transform)
+                    )
+
+    def test_options_given_to_evaluator(self):
+        prepared = hydroeval.PreparedEvaluation(self.obs, transform='log')
+        for option in ({'transform': 'log'}, {'epsilon': 0.1},
+                       {'dtype': 'float32'}):
+            with self.subTest(option=option):
+                with self.assertRaises(ValueError):
+                    hydroeval.evaluator(hydroeval.nse, self.sim, prepared,
+                                        **option)
+
+    def test_incompatible_lengths(self):
+        prepared = hydroeval.PreparedEvaluation(self.obs)
+        with self.assertRaises(ValueError):
+            hydroeval.evaluator(hydroeval.nse, self.sim[:-1], prepared)
+
+
+class TestEvaluatorBatch(unittest.TestCase):
+
+    rng = numpy.random.default_rng(13)
+    sim = rng.uniform(0.1, 20., (2, 3, 4, 60))
+    obs = rng.uniform(0.1, 20., 60)
+    obs[[7, 33]] = numpy.nan
+
+    def test_against_evaluator(self):
+        for obj_fn in (hydroeval.nse, hydroeval.kge, hydroeval.pbias):
+            for prepare in (False, True):
+                with self.subTest(objective_function=obj_fn.__name__,
+                                  prepared=prepare):
+                    evaluation = (
+                        hydroeval.PreparedEvaluation(self.obs, transform='log')
+                        if prepare else self.obs
+                    )
+                    options = {} if prepare else {'transform': 'log'}
+                    result = hydroeval.evaluator_batch(
+                        obj_fn, self.sim, evaluation, **options)
+                    for index in numpy.ndindex(self.sim.shape[:-1]):
+                        numpy.testing.assert_almost_equal(
+                            result[index],
+                            hydroeval.evaluator(obj_fn, self.sim[index],
+                                                self.obs, transform='log'
+                                                )[..., 0]
+                        )
+
+    def test_non_numerical_simulations(self):
+        with self.assertRaises(TypeError):
+            hydroeval.evaluator_batch(hydroeval.nse, [['a'] * 60], self.obs)
+
+
 if __name__ == '__main__':
     test_loader = unittest.TestLoader()
     test_suite = unittest.TestSuite()
 
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestEvaluator))
+    test_suite.addTests(
+        test_loader.loadTestsFromTestCase(TestPreparedEvaluation))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestEvaluatorBatch))
     test_suite.addTests(doctest.DocTestSuite(hydroeval.hydroeval))
 
     runner = unittest.TextTestRunner(verbosity=2)
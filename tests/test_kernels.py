@@ -0,0 +1,73 @@
+import unittest
+import numpy
+
+import hydroeval
+from hydroeval import _kernels
+
+
+@unittest.skipUnless(_kernels.fused, 'numba is not available')
+class TestFusedKernels(unittest.TestCase):
+
+    rng = numpy.random.default_rng(42)
+    sim = rng.uniform(0., 20., 500)
+    obs = rng.uniform(0., 20., 500)
+    obs[rng.choice(500, 25, replace=False)] = numpy.nan
+
+    def reference(self, obj_fn, transform, epsilon, sim=None, obs=None):
+        sim = self.sim if sim is None else sim
+        obs = self.obs if obs is None else obs
+        avail = ~numpy.isnan(obs)
+        sim, obs = sim[avail, None], obs[avail, None]
+        if transform in ('log', 'inv') and epsilon is None:
+            epsilon = 0.01 * numpy.mean(obs)
+        if transform == 'log':
+            sim, obs = numpy.log(sim + epsilon), numpy.log(obs + epsilon)
+        elif transform == 'inv':
+            sim, obs = 1.0 / (sim + epsilon), 1.0 / (obs + epsilon)
+        elif transform == 'sqrt':
+            sim, obs = numpy.sqrt(sim), numpy.sqrt(obs)
+
+        return obj_fn(sim, obs)
+
+    def test_against_objective_functions(self):
+        for obj_fn in _kernels.fused:
+            for transform in (None, 'log', 'inv', 'sqrt'):
+                for epsilon in (None, 0., 0.5, numpy.nan):
+                    with self.subTest(objective_function=obj_fn.__name__,
+                                      transform=transform, epsilon=epsilon):
+                        numpy.testing.assert_almost_equal(
+                            hydroeval.evaluator(obj_fn, self.sim, self.obs,
+                                                transform=transform,
+                                                epsilon=epsilon),
+                            self.reference(obj_fn, transform, epsilon)
+                        )
+
+    def test_negative_evaluation(self):
+        # NaN resulting from the transformation of a negative observation
+        # must propagate rather than be treated as a missing observation
+        obs = self.obs.copy()
+        obs[10] = -3.
+        for obj_fn in _kernels.fused:
+            for transform in (None, 'log', 'inv', 'sqrt'):
+                for epsilon in (None, 0.1):
+                    with self.subTest(objective_function=obj_fn.__name__,
+                                      transform=transform, epsilon=epsilon):
+                        with numpy.errstate(invalid='ignore'):
+                            numpy.testing.assert_almost_equal(
+                                hydroeval.evaluator(obj_fn, self.sim, obs,
+                                                    transform=transform,
+                                                    epsilon=epsilon),
+                                self.reference(obj_fn, transform, epsilon,
+                                               obs=obs)
+                            )
+
+
+if __name__ == '__main__':
+    test_loader = unittest.TestLoader()
+    test_suite = unittest.TestSuite()
+
+    test_suite.addTests(
+        test_loader.loadTestsFromTestCase(TestFusedKernels))
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(test_suite)
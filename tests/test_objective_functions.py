@@ -34,8 +34,8 @@ _obs = numpy.array(
 
 class TestObjectiveFunctions(unittest.TestCase):
 
-    sim = numpy.array([_sim, _obs]).T
-    obs = numpy.array([_obs]).T
+    sim = numpy.stack((_sim, _obs), axis=1)
+    obs = _obs[:, numpy.newaxis]
 
     expected = {
         'nse': [-0.4147181744134911, 1.],